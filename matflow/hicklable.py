@@ -50,6 +50,10 @@ def to_hicklable(obj):
         if not hasattr(obj, '__dict__') and not hasattr(obj, '__slots__'):
             raise ValueError(f'Object not understood: {obj}.')
 
+        # Objects may exclude attributes that should not be persisted (e.g. caches):
+        for attr in getattr(obj, '_hicklable_exclude', []):
+            all_attrs.pop(attr, None)
+
         obj_valid = {}
         for attr, value in all_attrs.items():
             obj_valid.update({attr: to_hicklable(value)})
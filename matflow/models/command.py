@@ -5,8 +5,10 @@ Module containing functionality for executing commands.
 """
 
 import copy
-
-import numpy as np
+import functools
+import re
+import sys
+from itertools import chain
 
 from matflow.errors import CommandError
 from matflow.utils import dump_to_yaml_string
@@ -26,10 +28,80 @@ DEFAULT_FORMATTERS = {
     tuple: list_formatter,
 }
 
+# Substring of a command file name template that is substituted by an increment:
+_INC_MARKER = '<<inc>>'
+
+
+@functools.lru_cache(maxsize=None)
+def _get_label_pattern(labels):
+    """Get a compiled regular expression that matches any of the given command file
+    label markers in a single pass, capturing the label.
+
+    Parameters
+    ----------
+    labels : tuple of str
+
+    Returns
+    -------
+    re.Pattern
+
+    """
+    labels_fmt = '|'.join(re.escape(i) for i in labels)
+    return re.compile(f'<<({labels_fmt})>>')
+
+
+def _find_labels(text, pattern):
+    """Find the command file labels whose markers appear in a string."""
+    if not text or '<<' not in text:
+        return []
+    return pattern.findall(text)
+
+
+def _sub_labels(text, pattern, file_names):
+    """Substitute command file label markers in a string with their file names."""
+    # Most labelled strings consist of a single label marker only:
+    if text[2:-2] in file_names and text.startswith('<<') and text.endswith('>>'):
+        return file_names[text[2:-2]]
+    return pattern.sub(lambda m: file_names.get(m.group(1), m.group(0)), text)
+
+
+def sub_command_file_names(text, file_names):
+    """Substitute command file label markers in a string with their file names, in a
+    single pass.
+
+    Parameters
+    ----------
+    text : str
+    file_names : dict of (str: str)
+        File name of each command file label.
+
+    Returns
+    -------
+    str
+        The string with markers substituted, or the original string if it contains no
+        known markers.
+
+    """
+    if not file_names or not text or '<<' not in text:
+        return text
+    return _sub_labels(text, _get_label_pattern(tuple(file_names)), file_names)
+
 
 class CommandGroup(object):
     """Class to represent a group of commands."""
 
+    __slots__ = [
+        'commands',
+        'command_files',
+        'command_pathways',
+        '_pathway_conditions',
+        '_pathway_order',
+        '_pathway_cache',
+    ]
+
+    # Derived attributes that are not persisted:
+    _hicklable_exclude = ['_pathway_conditions', '_pathway_order', '_pathway_cache']
+
     def __init__(self, commands, command_files=None, command_pathways=None):
         """
         Parameters
@@ -41,10 +113,20 @@ class CommandGroup(object):
         """
 
         self.commands = [Command(**i) for i in commands]
-        self.command_files = command_files or {}
+        # Intern labels and file name templates, which are used repeatedly as dict keys
+        # and in comparisons:
+        self.command_files = {
+            sys.intern(k) if isinstance(k, str) else k:
+            sys.intern(v) if isinstance(v, str) else v
+            for k, v in (command_files or {}).items()
+        }
         self.command_pathways = command_pathways or []
 
+        # Map defined input names to the selected command pathway index:
+        self._pathway_cache = {}
+
         self._validate_command_pathways()
+        self._validate_command_files()
         self.resolve_command_pathways()
 
     @property
@@ -73,10 +155,11 @@ class CommandGroup(object):
 
         """
 
+        inputs_set = frozenset(inputs_list)
         for cmd_pth_idx, cmd_pth in enumerate(self.command_pathways):
             condition = cmd_pth.get('condition')
             if condition:
-                bad_keys = set(condition) - set(inputs_list)
+                bad_keys = set(condition) - inputs_set
                 if bad_keys:
                     bad_keys_fmt = ', '.join(['"{}"'.format(i) for i in bad_keys])
                     msg = ((f'Unknown command pathway condition inputs for command '
@@ -90,15 +173,16 @@ class CommandGroup(object):
                 {'commands_idx': list(range(len(self.all_commands)))}
             ]
 
-        req_keys = ['commands_idx']
-        allowed_keys = req_keys + ['condition', 'commands']
+        req_keys = {'commands_idx'}
+        allowed_keys = req_keys | {'condition', 'commands'}
 
         # Check the condition list is a list of input labels for this task (have to be invoked by schema)
         no_condition_count = 0
+        valid_cmds_idx = range(len(self.all_commands))
         for cmd_pth_idx, cmd_pth in enumerate(self.command_pathways):
 
-            bad_keys = set(cmd_pth) - set(allowed_keys)
-            miss_keys = set(req_keys) - set(cmd_pth)
+            bad_keys = set(cmd_pth) - allowed_keys
+            miss_keys = req_keys - set(cmd_pth)
 
             if bad_keys:
                 bad_keys_fmt = ', '.join(['"{}"'.format(i) for i in bad_keys])
@@ -118,7 +202,7 @@ class CommandGroup(object):
             cmds_idx = cmd_pth['commands_idx']
             if (
                 not isinstance(cmds_idx, list) or
-                not all([i in range(len(self.all_commands)) for i in cmds_idx])
+                not all(i in valid_cmds_idx for i in cmds_idx)
             ):
                 msg = (f'`commands_idx` must be a list of integer indices into '
                        f'`all_commands`.')
@@ -129,66 +213,47 @@ class CommandGroup(object):
                    f'(the default command pathway).')
             raise CommandError(msg)
 
+        self._pathway_conditions = [
+            frozenset(i.get('condition') or ()) for i in self.command_pathways
+        ]
+
+        # Order pathways by most-specific first:
+        self._pathway_order = sorted(
+            range(len(self.command_pathways)),
+            key=lambda i: len(self._pathway_conditions[i]),
+        )[::-1]
+
     def resolve_command_pathways(self):
         """Add a `commands` list to each `commands_pathway`, according to its 
         `commands_idx`."""
 
         for cmd_pth_idx, cmd_pth in enumerate(self.command_pathways):
-            commands = [copy.deepcopy(self.all_commands[i])
-                        for i in cmd_pth['commands_idx']]
+            commands = [self.all_commands[i].clone() for i in cmd_pth['commands_idx']]
             cmd_pth.update({'commands': commands})
             self.resolve_command_files(cmd_pth_idx)
 
-    def resolve_command_files(self, cmd_pathway_idx):
-
-        # Validate command_files dict first:
+    def _validate_command_files(self):
         for cmd_fn_label, cmd_fn in self.command_files.items():
-            if not isinstance(cmd_fn, str) or '<<inc>>' not in cmd_fn:
+            if not isinstance(cmd_fn, str) or _INC_MARKER not in cmd_fn:
                 msg = ('`command_files` must be a dict that maps a command file label to '
                        'a file name template that must include the substring "<<inc>>", '
                        'which is substituted by increasing integers.')
                 raise CommandError(msg)
 
-        file_names = self.get_command_file_names(cmd_pathway_idx)
-
-        for cmd_idx, command in enumerate(self.get_commands(cmd_pathway_idx)):
-
-            for opt_idx, opt in enumerate(command.options):
-                for opt_token_idx, opt_token in enumerate(opt):
-                    options_files = file_names['all_commands'][cmd_idx]['options']
-                    for cmd_fn_label, cmd_fn in options_files.items():
-                        if f'<<{cmd_fn_label}>>' in opt_token:
-                            new_fmt_opt = opt_token.replace(f'<<{cmd_fn_label}>>', cmd_fn)
-                            command.options[opt_idx][opt_token_idx] = new_fmt_opt
-
-            for param_idx, param in enumerate(command.parameters):
-                params_files = file_names['all_commands'][cmd_idx]['parameters']
-                for cmd_fn_label, cmd_fn in params_files.items():
-                    if f'<<{cmd_fn_label}>>' in param:
-                        new_param = param.replace(f'<<{cmd_fn_label}>>', cmd_fn)
-                        command.parameters[param_idx] = new_param
-
-            if command.stdin:
-                stdin_files = file_names['all_commands'][cmd_idx]['stdin']
-                for cmd_fn_label, cmd_fn in stdin_files.items():
-                    if f'<<{cmd_fn_label}>>' in command.stdin:
-                        new_stdin = command.stdin.replace(f'<<{cmd_fn_label}>>', cmd_fn)
-                        command.stdin = new_stdin
-
-            if command.stdout:
-                new_stdout = command.stdout
-                stdout_files = file_names['all_commands'][cmd_idx]['stdout']
-                for cmd_fn_label, cmd_fn in stdout_files.items():
-                    if f'<<{cmd_fn_label}>>' in command.stdout:
-                        new_stdout = command.stdout.replace(f'<<{cmd_fn_label}>>', cmd_fn)
-                        command.stdout = new_stdout
-
-            if command.stderr:
-                stderr_files = file_names['all_commands'][cmd_idx]['stderr']
-                for cmd_fn_label, cmd_fn in stderr_files.items():
-                    if f'<<{cmd_fn_label}>>' in command.stderr:
-                        new_stderr = command.stderr.replace(f'<<{cmd_fn_label}>>', cmd_fn)
-                        command.stderr = new_stderr
+    def resolve_command_files(self, cmd_pathway_idx):
+
+        _, substitutions = self._get_command_file_names(cmd_pathway_idx)
+
+        for command, cmd_subs in zip(self.get_commands(cmd_pathway_idx), substitutions):
+            options = command.options
+            parameters = command.parameters
+            for stream, idx, new_text in cmd_subs:
+                if stream == 'options':
+                    options[idx[0]][idx[1]] = new_text
+                elif stream == 'parameters':
+                    parameters[idx] = new_text
+                else:
+                    setattr(command, stream, new_text)
 
     def get_commands(self, cmd_pathway_idx):
         return self.command_pathways[cmd_pathway_idx]['commands']
@@ -209,17 +274,16 @@ class CommandGroup(object):
         """
 
         # Consider an input defined if any of its values (in the sequence) are not `None`:
-        inputs_defined = [k for k, v in inputs.items() if any([i is not None for i in v])]
+        inputs_defined = frozenset(
+            k for k, v in inputs.items() if any(i is not None for i in v)
+        )
 
-        # Sort pathways by most-specific first:
-        order_idx = np.argsort([len(i.get('condition', []))
-                                for i in self.command_pathways])[::-1]
+        if inputs_defined in self._pathway_cache:
+            return self._pathway_cache[inputs_defined]
 
         cmd_pathway_idx = None
-        for cmd_pth_idx in order_idx:
-            cmd_pth = self.command_pathways[cmd_pth_idx]
-            condition = cmd_pth.get('condition', [])
-            if not (set(condition) - set(inputs_defined)):
+        for cmd_pth_idx in self._pathway_order:
+            if self._pathway_conditions[cmd_pth_idx].issubset(inputs_defined):
                 # All inputs named in condition are defined
                 cmd_pathway_idx = cmd_pth_idx
                 break
@@ -227,25 +291,61 @@ class CommandGroup(object):
         if cmd_pathway_idx is None:
             raise CommandError('Could not find suitable command pathway.')
 
+        self._pathway_cache[inputs_defined] = cmd_pathway_idx
+
         return cmd_pathway_idx
 
     def get_command_file_names(self, cmd_pathway_idx):
+        return self._get_command_file_names(cmd_pathway_idx)[0]
+
+    def _get_command_file_names(self, cmd_pathway_idx):
+        """Get the command file names of a command pathway, and the command strings that
+        result from their substitution.
+
+        Parameters
+        ----------
+        cmd_pathway_idx : int
+
+        Returns
+        -------
+        tuple of (file_names, substitutions)
+            file_names : dict
+                Dict with keys "input_map", "output_map" and "all_commands", where the
+                latter has one dict for each command in the pathway, mapping each command
+                stream to a dict of command file labels and file names.
+            substitutions : list of list of tuple
+                For each command in the pathway, a list of (stream, index, new_text)
+                tuples for each raw command string that includes command file labels.
+                `stream` is the command attribute (e.g. "options" or "stdout"), `index`
+                locates the string within that attribute (`None` for stdin, stdout and
+                stderr), and `new_text` is the string with file names substituted.
+
+        """
 
         out = {
             'input_map': {},
             'output_map': {},
             'all_commands': [],
         }
+        substitutions = []
 
         file_name_increments = {k: 0 for k in self.command_files.keys()}
 
+        # Split file name templates around the increment marker once, so new file names
+        # are formed by joining the parts with the increment:
+        file_name_parts = {k: v.split(_INC_MARKER) for k, v in self.command_files.items()}
+
+        # Match any command file label marker in a single pass:
+        marker_pattern = _get_label_pattern(tuple(self.command_files))
+
+        def get_new_file_name(cmd_fn_label):
+            return str(file_name_increments[cmd_fn_label]).join(
+                file_name_parts[cmd_fn_label]
+            )
+
         # Input map should use the first increment:
         for cmd_fn_label in self.command_files.keys():
-            new_fn = self.command_files[cmd_fn_label].replace(
-                '<<inc>>',
-                str(file_name_increments[cmd_fn_label]),
-            )
-            out['input_map'].update({cmd_fn_label: new_fn})
+            out['input_map'].update({cmd_fn_label: get_new_file_name(cmd_fn_label)})
 
         for command in self.get_commands(cmd_pathway_idx):
 
@@ -257,69 +357,59 @@ class CommandGroup(object):
                 'stderr': {},
             }
 
-            cmd_fn_is_incremented = {k: False for k in self.command_files.keys()}
+            raw_strings = [
+                ('options', (opt_idx, opt_token_idx), opt_token)
+                for opt_idx, opt in enumerate(command.options_raw)
+                for opt_token_idx, opt_token in enumerate(opt)
+            ]
+            raw_strings += [
+                ('parameters', param_idx, param)
+                for param_idx, param in enumerate(command.parameters_raw)
+            ]
+            raw_strings += [
+                ('stdin', None, command.stdin_raw),
+                ('stdout', None, command.stdout_raw),
+                ('stderr', None, command.stderr_raw),
+            ]
+
+            # Scan each raw string once for command file labels:
+            labelled_strings = []
+            stream_labels = {k: set() for k in file_names_i}
+            for stream, idx, text in raw_strings:
+                labels = _find_labels(text, marker_pattern)
+                if labels:
+                    labelled_strings.append((stream, idx, text))
+                    stream_labels[stream].update(labels)
+
             for cmd_fn_label in self.command_files.keys():
 
-                for opt in command.options_raw:
-                    fmt_opt = list(opt)
-                    for opt_token in fmt_opt:
-                        if f'<<{cmd_fn_label}>>' in opt_token:
-                            new_fn = self.command_files[cmd_fn_label].replace(
-                                '<<inc>>',
-                                str(file_name_increments[cmd_fn_label]),
-                            )
-                            file_names_i['stdin'].update({cmd_fn_label: new_fn})
-
-                for param in command.parameters_raw:
-                    if f'<<{cmd_fn_label}>>' in param:
-                        new_fn = self.command_files[cmd_fn_label].replace(
-                            '<<inc>>',
-                            str(file_name_increments[cmd_fn_label]),
-                        )
-                        file_names_i['parameters'].update({cmd_fn_label: new_fn})
-
-                if command.stdin_raw:
-                    if f'<<{cmd_fn_label}>>' in command.stdin_raw:
-                        new_fn = self.command_files[cmd_fn_label].replace(
-                            '<<inc>>',
-                            str(file_name_increments[cmd_fn_label]),
-                        )
-                        file_names_i['stdin'].update({cmd_fn_label: new_fn})
-
-                if command.stdout_raw:
-                    if f'<<{cmd_fn_label}>>' in command.stdout_raw:
+                # Command inputs use the current file name:
+                for stream in ['options', 'parameters', 'stdin']:
+                    if cmd_fn_label in stream_labels[stream]:
+                        new_fn = get_new_file_name(cmd_fn_label)
+                        file_names_i[stream].update({cmd_fn_label: new_fn})
+
+                # Command outputs use a new file name, incremented at most once:
+                for stream in ['stdout', 'stderr']:
+                    if cmd_fn_label in stream_labels[stream]:
                         file_name_increments[cmd_fn_label] += 1
-                        cmd_fn_is_incremented[cmd_fn_label] = True
-                        new_fn = self.command_files[cmd_fn_label].replace(
-                            '<<inc>>',
-                            str(file_name_increments[cmd_fn_label]),
-                        )
-                        file_names_i['stdout'].update({cmd_fn_label: new_fn})
-
-                if command.stderr_raw:
-                    if f'<<{cmd_fn_label}>>' in command.stderr_raw:
-                        if not cmd_fn_is_incremented[cmd_fn_label]:
-                            file_name_increments[cmd_fn_label] += 1
-                        new_fn = self.command_files[cmd_fn_label].replace(
-                            '<<inc>>',
-                            str(file_name_increments[cmd_fn_label]),
-                        )
-
-                        if not cmd_fn_is_incremented[cmd_fn_label]:
-                            cmd_fn_is_incremented[cmd_fn_label] = True
-                            file_names_i['stderr'].update({cmd_fn_label: new_fn})
+                        new_fn = get_new_file_name(cmd_fn_label)
+                        file_names_i[stream].update({cmd_fn_label: new_fn})
+                        break
 
             out['all_commands'].append(file_names_i)
+            # Strings from streams without any recorded file names are left unchanged:
+            substitutions.append([
+                (stream, idx, _sub_labels(text, marker_pattern, file_names_i[stream]))
+                for stream, idx, text in labelled_strings
+                if file_names_i[stream]
+            ])
 
         # Output map should use the final increment:
         for cmd_fn_label in self.command_files.keys():
-            new_fn = self.command_files[cmd_fn_label].replace(
-                '<<inc>>',
-                str(file_name_increments[cmd_fn_label]),
-            )
-            out['output_map'].update({cmd_fn_label: new_fn})
+            out['output_map'].update({cmd_fn_label: get_new_file_name(cmd_fn_label)})
 
-        return out
+        return out, substitutions
 
     def get_formatted_commands(self, inputs_list, num_cores, cmd_pathway_idx):
         """Format commands into strings with hpcflow variable substitutions where
@@ -348,54 +438,47 @@ class CommandGroup(object):
 
         fmt_commands = []
 
+        inputs_set = frozenset(inputs_list)
         var_names = {}
-        for command in self.get_commands(cmd_pathway_idx):
-
-            fmt_opts = []
-            for opt in command.options:
-                fmt_opt = list(opt)
-                for opt_token_idx, opt_token in enumerate(fmt_opt):
-                    if opt_token in inputs_list:
-                        # Replace with an `hpcflow` variable:
-                        var_name = 'matflow_input_{}'.format(opt_token)
-                        fmt_opt[opt_token_idx] = '<<{}>>'.format(var_name)
-                        if opt_token not in var_names:
-                            var_names.update({opt_token: var_name})
-
-                fmt_opt_joined = ' '.join(fmt_opt)
-                fmt_opts.append(fmt_opt_joined)
+        fmt_vars = {}
+
+        def format_token(token):
+            if token not in inputs_set:
+                return token
+            if token not in fmt_vars:
+                # Replace with an `hpcflow` variable:
+                var_name = f'matflow_input_{token}'
+                var_names.update({token: var_name})
+                fmt_vars.update({token: f'<<{var_name}>>'})
+            return fmt_vars[token]
 
-            fmt_params = []
-            for param in command.parameters:
-
-                fmt_param = param
-                if param in inputs_list:
-                    # Replace with an `hpcflow` variable:
-                    var_name = 'matflow_input_{}'.format(param)
-                    fmt_param = '<<{}>>'.format(var_name)
+        for command in self.get_commands(cmd_pathway_idx):
 
-                    if param not in var_names:
-                        var_names.update({param: var_name})
+            fmt_opts = [' '.join([format_token(i) for i in opt]) for opt in command.options]
+            fmt_params = [format_token(i) for i in command.parameters]
 
-                fmt_params.append(fmt_param)
+            cmd_fmt = ' '.join(chain([command.command], fmt_opts, fmt_params))
 
-            cmd_fmt = ' '.join([command.command] + fmt_opts + fmt_params)
+            stdin = command.stdin
+            stdout = command.stdout
+            stderr = command.stderr
 
-            if command.stdin:
-                cmd_fmt += ' < {}'.format(command.stdin)
+            if stdin:
+                cmd_fmt += ' < {}'.format(stdin)
 
-            if command.stdout:
-                cmd_fmt += ' >> {}'.format(command.stdout)
+            if stdout:
+                cmd_fmt += ' >> {}'.format(stdout)
 
-            if command.stderr:
-                if command.stderr == command.stdout:
+            if stderr:
+                if stderr == stdout:
                     cmd_fmt += ' 2>&1'
                 else:
-                    cmd_fmt += ' 2>> {}'.format(command.stderr)
+                    cmd_fmt += ' 2>> {}'.format(stderr)
 
             cmd_dict = {'line': cmd_fmt}
-            if command.parallel_mode and num_cores > 1:
-                cmd_dict.update({'parallel_mode': command.parallel_mode})
+            parallel_mode = command.parallel_mode
+            if parallel_mode and num_cores > 1:
+                cmd_dict.update({'parallel_mode': parallel_mode})
 
             fmt_commands.append(cmd_dict)
 
@@ -405,6 +488,21 @@ class CommandGroup(object):
 class Command(object):
     """Class to represent a command to be executed by a shell."""
 
+    __slots__ = [
+        'command',
+        'parallel_mode',
+        'options_raw',
+        'parameters_raw',
+        'stdin_raw',
+        'stdout_raw',
+        'stderr_raw',
+        'options',
+        'parameters',
+        'stdin',
+        'stdout',
+        'stderr',
+    ]
+
     def __init__(self, command, options=None, parameters=None, stdin=None, stdout=None,
                  stderr=None, parallel_mode=None):
 
@@ -420,8 +518,8 @@ class Command(object):
 
         # Non-raw versions modified by the parent CommandGroup to include any resolved
         # command file name:
-        self.options = copy.deepcopy(self.options_raw)
-        self.parameters = copy.deepcopy(self.parameters_raw)
+        self.options = [list(i) for i in self.options_raw]
+        self.parameters = list(self.parameters_raw)
         self.stdin = self.stdin_raw
         self.stdout = self.stdout_raw
         self.stderr = self.stderr_raw
@@ -441,13 +539,23 @@ class Command(object):
         out += ')'
         return out
 
+    def clone(self):
+        """Get a copy of this command whose resolved `options` and `parameters` can be
+        modified independently of this command."""
+
+        new_cmd = copy.copy(self)
+        new_cmd.options = [list(i) for i in self.options]
+        new_cmd.parameters = list(self.parameters)
+
+        return new_cmd
+
     def __str__(self):
 
-        cmd_fmt = ' '.join(
-            [self.command] +
-            [' '.join(i) for i in self.options] +
-            self.parameters
-        )
+        cmd_fmt = ' '.join(chain(
+            [self.command],
+            (' '.join(i) for i in self.options),
+            self.parameters,
+        ))
 
         if self.stdin:
             cmd_fmt += ' < {}'.format(self.stdin)
@@ -10,10 +10,14 @@ is easier. The classes themselves mainly serve to provide useful properties.
 
 """
 
+import bisect
 import copy
+import sys
+import weakref
 from warnings import warn
 from pprint import pprint
 from itertools import product
+from collections import deque
 import numpy as np
 from hpcflow.scheduler import SunGridEngine
 
@@ -33,12 +37,125 @@ from matflow.errors import (
     MissingSoftwareSourcesError,
     TaskParameterError,
 )
-from matflow.utils import (tile, repeat, arange, extend_index_list, flatten_list,
-                           to_sub_list, get_specifier_dict, move_element_forward)
+from matflow.utils import (tile, repeat, arange, extend_index_list, get_specifier_dict,
+                           move_element_forward, copy_containers, to_flat_index_array,
+                           from_flat_index_array)
+from matflow.models.command import sub_command_file_names
 from matflow.models.task import Task, TaskSchema
 from matflow.models.software import SoftwareInstance
 
 
+def quote_join(names):
+    """Format names as a comma-separated string of quoted names, for error messages."""
+    return ', '.join([f'"{i}"' for i in names])
+
+
+# Allowed keys in a sequence definition:
+_REQ_SEQ_KEYS = frozenset(['name', 'vals'])
+_ALLOWED_SEQ_KEYS = _REQ_SEQ_KEYS | {'nest_idx'}
+
+# Allowed keys in a task definition loaded from a workflow file:
+_REQ_TASK_KEYS_FROM_FILE = frozenset([
+    'id',
+    'name',
+    'method',
+    'elements',
+    'software_instance',
+    'prepare_software_instance',
+    'process_software_instance',
+    'task_idx',
+    'run_options',
+    'prepare_run_options',
+    'process_run_options',
+    'status',
+    'stats',
+    'context',
+    'local_inputs',
+    'schema',
+    'resource_usage',
+    'base',
+    'sequences',
+    'repeats',
+    'groups',
+    'nest',
+    'merge_priority',
+    'output_map_options',
+    'command_pathway_idx',
+])
+
+# Allowed keys in a new task definition:
+_REQ_TASK_KEYS = frozenset(['name', 'software', 'method'])
+_ALLOWED_TASK_KEYS = _REQ_TASK_KEYS | {
+    'run_options',
+    'stats',
+    'context',
+    'contexts',
+    'base',
+    'sequences',
+    'repeats',
+    'groups',
+    'nest',
+    'merge_priority',
+    'output_map_options',
+}
+
+# Information derived from each task schema, which is shared between tasks:
+_SCHEMA_INFO = weakref.WeakKeyDictionary()
+
+
+def get_schema_info(schema):
+    """Get (cached) information about the inputs and outputs of a task schema.
+
+    Parameters
+    ----------
+    schema : TaskSchema
+
+    Returns
+    -------
+    dict
+        Dict with keys:
+            default_inputs : list of tuple of (str, object)
+                Name and default value of each schema input that has a default value.
+            allowed_grp : list of str
+                Names of parameters by which task elements may be grouped.
+            allowed_grp_set : frozenset of str
+                Set of `allowed_grp`, for membership tests.
+            input_names_set : frozenset of str
+                Set of the schema input names.
+            outputs_set : frozenset of str
+                Set of the schema outputs.
+            name_to_alias : dict of (str: str)
+                Alias of the first schema input with each input name.
+            alias_to_group : dict of (str: str)
+                Group name of each schema input, keyed by input alias.
+
+    """
+
+    info = _SCHEMA_INFO.get(schema)
+    if info is None:
+        input_names = schema.input_names
+        # Aliases and group names are used as keys throughout the element index, so
+        # intern them:
+        name_to_alias = {}
+        for i in schema.inputs:
+            name_to_alias.setdefault(i['name'], sys.intern(i['alias']))
+        allowed_grp = input_names + ['repeats']
+        info = {
+            'default_inputs': [(i['name'], i['default']) for i in schema.inputs
+                               if 'default' in i],
+            'allowed_grp': allowed_grp,
+            'allowed_grp_set': frozenset(allowed_grp),
+            'input_names_set': frozenset(input_names),
+            'outputs_set': frozenset(schema.outputs),
+            'name_to_alias': name_to_alias,
+            'alias_to_group': {sys.intern(i['alias']): sys.intern(i['group'])
+                               for i in schema.inputs},
+        }
+        _SCHEMA_INFO[schema] = info
+
+    return info
+
+
 def normalise_local_inputs(base=None, sequences=None, is_from_file=False):
     """Validate and normalise sequences and task inputs for a given task.
 
@@ -78,23 +195,20 @@ def normalise_local_inputs(base=None, sequences=None, is_from_file=False):
 
     nest_req = True if len(sequences) > 1 else False
 
-    req_seq_keys = ['name', 'vals']
-    allowed_seq_keys = req_seq_keys + ['nest_idx']
-
     prev_num_vals = None
     prev_nest = None
     inputs_lst = []
     for seq in sequences:
 
-        miss_keys = list(set(req_seq_keys) - set(seq.keys()))
+        miss_keys = _REQ_SEQ_KEYS - seq.keys()
         if miss_keys:
-            miss_keys_fmt = ', '.join([f'"{i}"' for i in miss_keys])
+            miss_keys_fmt = quote_join(miss_keys)
             msg = f'Missing keys from sequence definition: {miss_keys_fmt}.'
             raise SequenceError(msg)
 
-        bad_keys = list(set(seq.keys()) - set(allowed_seq_keys))
+        bad_keys = seq.keys() - _ALLOWED_SEQ_KEYS
         if bad_keys:
-            bad_keys_fmt = ', '.join([f'"{i}"' for i in bad_keys])
+            bad_keys_fmt = quote_join(bad_keys)
             raise SequenceError(f'Unknown keys from sequence definition: {bad_keys_fmt}.')
 
         if not isinstance(seq['vals'], list):
@@ -129,13 +243,13 @@ def normalise_local_inputs(base=None, sequences=None, is_from_file=False):
 
         prev_num_vals = num_vals
         prev_nest = nest
-        inputs_lst.append(copy.deepcopy(seq))
+        inputs_lst.append({**seq, 'vals': list(seq['vals'])})
 
     for in_name, in_val in base.items():
         inputs_lst.append({
             'name': in_name,
             'nest_idx': -1,
-            'vals': [copy.deepcopy(in_val)],
+            'vals': [in_val],
         })
 
     inputs_lst.sort(key=lambda x: x['nest_idx'])
@@ -165,28 +279,23 @@ def get_local_inputs(task, is_from_file):
     schema = task['schema']
 
     inputs_lst = normalise_local_inputs(base, sequences, is_from_file)
-    default_inputs_lst = []
-
-    for input_dict in schema.inputs:
-        if 'default' in input_dict:
-            default_inputs_lst.append({
-                'name': input_dict['name'],
-                'nest_idx': -1,
-                'vals': [input_dict['default']],
-            })
+    schema_info = get_schema_info(schema)
+    default_inputs = schema_info['default_inputs']
+    allowed_grp = schema_info['allowed_grp']
+    allowed_grp_set = schema_info['allowed_grp_set']
 
     defined_inputs = [i['name'] for i in inputs_lst]
     schema.check_surplus_inputs(defined_inputs)
 
     # Find the number of elements associated with this task due to its local input
-    # sequences:
-    inputs_lst.sort(key=lambda x: x['nest_idx'])
+    # sequences (`inputs_lst` is already sorted by `nest_idx`):
     if inputs_lst:
         lengths = [len(i['vals']) for i in inputs_lst]
-        total_len = len(inputs_lst[0]['vals'])
-        for idx, i in enumerate(inputs_lst[1:], 1):
-            if i['nest_idx'] > inputs_lst[idx - 1]['nest_idx']:
-                total_len *= len(i['vals'])
+        nest_idxs = [i['nest_idx'] for i in inputs_lst]
+        total_len = lengths[0]
+        for idx in range(1, len(inputs_lst)):
+            if nest_idxs[idx] > nest_idxs[idx - 1]:
+                total_len *= lengths[idx]
 
         prev_reps = total_len
         prev_tile = 1
@@ -200,60 +309,61 @@ def get_local_inputs(task, is_from_file):
 
     for idx, input_i in enumerate(inputs_lst):
 
-        if (prev_nest is None) or (input_i['nest_idx'] > prev_nest):
-            rep_i = int(prev_reps / lengths[idx])
-            tile_i = int(total_len / (lengths[idx] * rep_i))
-            prev_nest = input_i['nest_idx']
+        length_i = lengths[idx]
+        nest_idx_i = nest_idxs[idx]
+        if (prev_nest is None) or (nest_idx_i > prev_nest):
+            rep_i = int(prev_reps / length_i)
+            tile_i = int(total_len / (length_i * rep_i))
+            prev_nest = nest_idx_i
         else:
             rep_i = prev_reps
             tile_i = prev_tile
 
-        vals_idx = tile(repeat(arange(lengths[idx]), rep_i), tile_i)
-        vals_idx = repeat(vals_idx, num_repeats)
-        repeats_idx = tile(arange(num_repeats), total_len)
+        # Equivalent to tiling (`tile_i` times) the value indices, each repeated
+        # `rep_i * num_repeats` times:
+        num_vals_idx = length_i * rep_i * tile_i * num_repeats
+        vals_idx = (np.arange(num_vals_idx) // (rep_i * num_repeats)) % length_i
 
         local_ins['inputs'].update({
-            input_i['name']: {
+            sys.intern(input_i['name']): {
                 'vals': input_i['vals'],
-                'vals_idx': vals_idx,
+                'vals_idx': vals_idx.tolist(),
             }
         })
         prev_reps = rep_i
         prev_tile = tile_i
 
+    if inputs_lst:
+        repeats_idx = np.tile(np.arange(num_repeats), total_len).tolist()
+
     local_ins['repeats_idx'] = repeats_idx
 
-    for def_input_i in default_inputs_lst:
+    for def_input_name, def_input_val in default_inputs:
         local_ins['default_inputs'].update({
-            def_input_i['name']: {
-                'vals': def_input_i['vals'],
-                'vals_idx': repeat([0] * total_len, num_repeats),
+            def_input_name: {
+                'vals': [def_input_val],
+                'vals_idx': [0] * (total_len * num_repeats),
             }
         })
 
-    allowed_grp = schema.input_names + ['repeats']
-    allowed_grp_fmt = ', '.join([f'"{i}"' for i in allowed_grp])
-
-    def_group = {'default': {'nest': nest, 'group_by': allowed_grp}}
+    all_groups = {'default': {'nest': nest, 'group_by': list(allowed_grp)}}
     if merge_priority is not None:
-        def_group['default'].update({'merge_priority': merge_priority})
+        all_groups['default'].update({'merge_priority': merge_priority})
 
-    user_groups = {}
     for group_name, group in (groups or {}).items():
 
         if 'group_by' not in group:
             raise ValueError(f'Missing `group_by` key in group {group_name}.')
 
         for param in group['group_by']:
-            if param not in allowed_grp:
+            if param not in allowed_grp_set:
+                allowed_grp_fmt = quote_join(allowed_grp)
                 msg = (f'Parameter "{param}" cannot be grouped, because it '
                        f'has no specified values. Allowed group values are: '
                        f'{allowed_grp_fmt}.')
                 raise ValueError(msg)
 
-        user_groups.update({f'user_group_{group_name}': group})
-
-    all_groups = {**def_group, **user_groups}
+        all_groups.update({sys.intern(f'user_group_{group_name}'): group})
 
     local_ins['groups'] = all_groups
     local_ins['length'] = total_len * num_repeats
@@ -296,35 +406,31 @@ def get_software_instance(software, run_options, all_software, type_label=''):
         If no matching software instance can be found.
 
     """
+    software_name = SoftwareInstance.get_software_safe(software['name'])
+    software_options = set(software['options'])
+    num_cores = run_options['num_cores']
+
     match = None
-    for name, instances in all_software.items():
+    for inst in all_software.get(software_name, []):
 
-        if name != SoftwareInstance.get_software_safe(software['name']):
+        if num_cores not in inst.cores_range:
+            continue
+        if inst.label != software['label']:
+            continue
+        if not software_options.issubset(inst.options):
             continue
 
-        for inst in instances:
-
-            if run_options['num_cores'] not in inst.cores_range:
-                continue
-            if inst.label != software['label']:
-                continue
-            if (set(software['options']) - set(inst.options)):
-                continue
-
-            # Check no conflicting scheduler options
-            keep_looking = False
-            for k, v in inst.required_scheduler_options.items():
-                if k in run_options and v != run_options[k]:
-                    keep_looking = True
-                    break
-
-            if keep_looking:
-                continue
-            else:
-                match = inst
+        # Check no conflicting scheduler options
+        keep_looking = False
+        for k, v in inst.required_scheduler_options.items():
+            if k in run_options and v != run_options[k]:
+                keep_looking = True
                 break
 
-        if match:
+        if keep_looking:
+            continue
+        else:
+            match = inst
             break
 
     if match:
@@ -343,7 +449,37 @@ def get_software_instance(software, run_options, all_software, type_label=''):
     return match
 
 
-def get_input_dependency(task_info_lst, input_dict, input_task_idx):
+def get_parameter_task_index(task_info_lst):
+    """Map each parameter name to the (sorted) indices of tasks that may provide it, either
+    as an output, or as a locally defined input.
+
+    Parameters
+    ----------
+    task_info_lst : list of dict
+        Each dict must have keys:
+            schema : TaskSchema
+            local_inputs : dict
+
+    Returns
+    -------
+    param_task_idx : dict of (str: list of int)
+
+    """
+
+    param_task_idx = {}
+    for task_idx, task_info in enumerate(task_info_lst):
+        schema_info = get_schema_info(task_info['schema'])
+        local_inputs = task_info['local_inputs']['inputs']
+        param_names = schema_info['outputs_set'] | {
+            i for i in schema_info['input_names_set'] if i in local_inputs
+        }
+        for param_name in param_names:
+            param_task_idx.setdefault(param_name, []).append(task_idx)
+
+    return param_task_idx
+
+
+def get_input_dependency(task_info_lst, input_dict, input_task_idx, param_task_idx=None):
 
     param_name = input_dict['name']
     param_context = input_dict['context']
@@ -353,11 +489,18 @@ def get_input_dependency(task_info_lst, input_dict, input_task_idx):
 
     input_dependency = []
 
-    for task_idx, task_info in enumerate(task_info_lst):
+    if param_task_idx is None:
+        candidate_idx = range(len(task_info_lst))
+    else:
+        # Only consider tasks that may provide this parameter:
+        candidate_idx = param_task_idx.get(param_name, [])
+
+    for task_idx in candidate_idx:
 
         if task_idx == input_task_idx:
             continue
 
+        task_info = task_info_lst[task_idx]
         upstream_context = task_info['context']
 
         # Determine if a dependency is allowed to exist between the given parameter and
@@ -370,32 +513,27 @@ def get_input_dependency(task_info_lst, input_dict, input_task_idx):
                 upstream_context == ''
             )
         ):
+            schema_info = get_schema_info(task_info['schema'])
+            is_output = param_name in schema_info['outputs_set']
+            is_input = param_name in schema_info['input_names_set']
+
             # A dependency may exist! The parameter as an output in an upstream task takes
             #  precedence over the parameter as an input in that same task:
-            if param_name in task_info['schema'].outputs:
+            if is_output:
                 input_dependency.append({
                     'from_task': task_idx,
                     'dependency_type': 'output',
-                    'is_parameter_modifying_task': False,
+                    # Note if this task is a parameter-modifying task for this
+                    # parameter, i.e. the parameter is both an input and an output:
+                    'is_parameter_modifying_task': is_input,
                 })
-            elif (
-                param_name in task_info['schema'].input_names and
-                param_name in task_info['local_inputs']['inputs']
-            ):
+            elif is_input and param_name in task_info['local_inputs']['inputs']:
                 input_dependency.append({
                     'from_task': task_idx,
                     'dependency_type': 'input',
                     'is_parameter_modifying_task': False,
                 })
 
-            # Make a note if this task is a parameter-modifying task for this parameter,
-            # i.e. the parameter is both an input and an output:
-            if (
-                param_name in task_info['schema'].outputs and
-                param_name in task_info['schema'].input_names
-            ):
-                input_dependency[-1].update({'is_parameter_modifying_task': True})
-
     return input_dependency
 
 
@@ -432,6 +570,8 @@ def get_dependency_idx(task_info_lst):
 
     """
 
+    param_task_idx = get_parameter_task_index(task_info_lst)
+
     dependency_idx = []
     for task_idx, task_info in enumerate(task_info_lst):
 
@@ -453,7 +593,12 @@ def get_dependency_idx(task_info_lst):
             input_alias = input_dict['alias']
             is_locally_defined = input_name in task_info['local_inputs']['inputs']
             default_defined = input_name in task_info['local_inputs']['default_inputs']
-            input_dependency = get_input_dependency(task_info_lst, input_dict, task_idx)
+            input_dependency = get_input_dependency(
+                task_info_lst,
+                input_dict,
+                task_idx,
+                param_task_idx,
+            )
 
             add_input_dep = False
             if is_locally_defined:
@@ -463,10 +608,15 @@ def get_dependency_idx(task_info_lst):
                 add_input_dep = True
 
             elif default_defined:
-                # Move the default value into the local inputs:
-                task_info_lst[task_idx]['local_inputs']['inputs'][input_name] = (
-                    copy.deepcopy(task_info['local_inputs']['default_inputs'][input_name])
-                )
+                # Move the default value into the local inputs. The values are not
+                # modified, so they are shared, but the dict is copied because it is
+                # later updated with data indices when the workflow is saved:
+                task_info_lst[task_idx]['local_inputs']['inputs'][input_name] = {
+                    **task_info['local_inputs']['default_inputs'][input_name]
+                }
+                # This task may now provide the input to subsequent tasks:
+                if task_idx not in param_task_idx.setdefault(input_name, []):
+                    bisect.insort(param_task_idx[input_name], task_idx)
 
             else:
                 msg = (f'Task input "{input_name}" for task "{task_name}" with task '
@@ -494,15 +644,16 @@ def check_direct_circular_dependencies(dependency_idx):
 
     """
 
-    all_deps = []
+    seen_deps = set()
     for idx, deps in enumerate(dependency_idx):
         for i in deps['task_dependencies']:
-            all_deps.append(tuple(sorted([idx, i])))
-
-    if len(all_deps) != len(set(all_deps)):
-        msg = (f'Workflow tasks are circularly dependent! `dependency_idx` is: '
-               f'{dependency_idx}')
-        raise IncompatibleWorkflow(msg)
+            # Encode the (undirected) dependency pair as a single integer:
+            dep_key = (idx << 32) | i if idx < i else (i << 32) | idx
+            if dep_key in seen_deps:
+                msg = (f'Workflow tasks are circularly dependent! `dependency_idx` is: '
+                       f'{dependency_idx}')
+                raise IncompatibleWorkflow(msg)
+            seen_deps.add(dep_key)
 
 
 def find_good_task_dependency_position(dep_idx, task_dependencies):
@@ -591,8 +742,47 @@ def singularise_input_dependencies(dep_idx_multi):
     return dep_idx_singular
 
 
+def has_circular_dependencies(dependency_idx):
+    """Check for direct or indirect circular dependencies between tasks, using Kahn's
+    algorithm.
+
+    Parameters
+    ----------
+    dependency_idx : list of dict
+        Each dict must have the key `task_dependencies`, which is a list of the indices
+        within `dependency_idx` of the tasks upon which that task depends.
+
+    Returns
+    -------
+    bool
+
+    """
+
+    num_deps = [len(set(i['task_dependencies'])) for i in dependency_idx]
+    dependents = [[] for _ in dependency_idx]
+    for idx, dep_idx_i in enumerate(dependency_idx):
+        for i in set(dep_idx_i['task_dependencies']):
+            dependents[i].append(idx)
+
+    ready = deque(idx for idx, num in enumerate(num_deps) if num == 0)
+    num_ordered = 0
+    while ready:
+        idx = ready.popleft()
+        num_ordered += 1
+        for i in dependents[idx]:
+            num_deps[i] -= 1
+            if num_deps[i] == 0:
+                ready.append(i)
+
+    return num_ordered != len(dependency_idx)
+
+
 def sort_dependency_idx(dependency_idx):
 
+    if has_circular_dependencies(dependency_idx):
+        raise RuntimeError('Could not sort dependency index due to circular '
+                           'dependencies!')
+
     dep_idx = copy.deepcopy(dependency_idx)
 
     # Maximum number of iterations should be that required to completely reverse the
@@ -647,53 +837,55 @@ def sort_dependency_idx(dependency_idx):
     return dep_idx
 
 
+# Allowed run options (SGE specific):
+_ALLOWED_RUN_OPTS = frozenset(
+    SunGridEngine.ALLOWED_USER_OPTS + ['num_cores', 'alternate_scratch']
+)
+_ALLOWED_RUN_OPTS_JOB_ARRAY = _ALLOWED_RUN_OPTS | {'job_array'}
+
+# Config names of the sticky and non-sticky default run options for each type of run
+# options:
+_DEFAULT_RUN_OPTS_NAMES = {
+    'preparation': (
+        'default_sticky_preparation_run_options',
+        'default_preparation_run_options',
+    ),
+    'processing': (
+        'default_sticky_processing_run_options',
+        'default_processing_run_options',
+    ),
+    'main': (
+        'default_sticky_run_options',
+        'default_run_options',
+    ),
+}
+
+
 def validate_run_options(run_opts, type_label=''):
 
-    # SGE specific:
-    ALLOWED = SunGridEngine.ALLOWED_USER_OPTS + ['num_cores', 'alternate_scratch']
-    if 'preparation' in type_label or 'processing' in type_label:
-        ALLOWED += ['job_array']
+    if 'preparation' in type_label:
+        run_opts_type = 'preparation'
+    elif 'processing' in type_label:
+        run_opts_type = 'processing'
+    else:
+        run_opts_type = 'main'
 
-    bad_keys = set(run_opts.keys()) - set(ALLOWED)
+    if run_opts_type == 'main':
+        allowed = _ALLOWED_RUN_OPTS
+    else:
+        allowed = _ALLOWED_RUN_OPTS_JOB_ARRAY
+
+    bad_keys = run_opts.keys() - allowed
     if bad_keys:
         bad_keys_fmt = ', '.join([f'{i!r}' for i in bad_keys])
         raise TaskError(f'Run options not known: {bad_keys_fmt}.')
 
-    run_opts = copy.deepcopy(run_opts)
-
-    if 'preparation' in type_label:
-        if not run_opts:
-            run_opts = {
-                **Config.get('default_sticky_preparation_run_options'),
-                **Config.get('default_preparation_run_options'),
-            }
-        else:
-            run_opts = {
-                **Config.get('default_sticky_preparation_run_options'),
-                **run_opts
-            }
-    elif 'processing' in type_label:
-        if not run_opts:
-            run_opts = {
-                **Config.get('default_sticky_processing_run_options'),
-                **Config.get('default_processing_run_options'),
-            }
-        else:
-            run_opts = {
-                **Config.get('default_sticky_processing_run_options'),
-                **run_opts
-            }
-    else:
-        if not run_opts:
-            run_opts = {
-                **Config.get('default_sticky_run_options'),
-                **Config.get('default_run_options'),
-            }
-        else:
-            run_opts = {
-                **Config.get('default_sticky_run_options'),
-                **run_opts
-            }
+    # Non-sticky defaults are used only if no run options are specified:
+    sticky_name, default_name = _DEFAULT_RUN_OPTS_NAMES[run_opts_type]
+    run_opts = {
+        **Config.get(sticky_name),
+        **(copy.deepcopy(run_opts) or Config.get(default_name)),
+    }
 
     if 'num_cores' not in run_opts:
         run_opts.update({'num_cores': 1})
@@ -710,6 +902,15 @@ def validate_run_options(run_opts, type_label=''):
     return run_opts
 
 
+# Keys of validated task dicts whose values are objects that are modified per task:
+_TASK_OBJECT_KEYS = (
+    'schema',
+    'software_instance',
+    'prepare_software_instance',
+    'process_software_instance',
+)
+
+
 def validate_task_dict(task, is_from_file, all_software, all_task_schemas,
                        all_sources_maps):
     """Validate a task dict.
@@ -746,51 +947,12 @@ def validate_task_dict(task, is_from_file, all_software, all_task_schemas,
         raise TaskError(f'Task definition must be a dict, but "{type(task)}" given.')
 
     if is_from_file:
-        req_keys = [
-            'id',
-            'name',
-            'method',
-            'elements',
-            'software_instance',
-            'prepare_software_instance',
-            'process_software_instance',
-            'task_idx',
-            'run_options',
-            'prepare_run_options',
-            'process_run_options',
-            'status',
-            'stats',
-            'context',
-            'local_inputs',
-            'schema',
-            'resource_usage',
-            'base',
-            'sequences',
-            'repeats',
-            'groups',
-            'nest',
-            'merge_priority',
-            'output_map_options',
-            'command_pathway_idx',
-        ]
+        req_keys = _REQ_TASK_KEYS_FROM_FILE
         good_keys = req_keys
         def_keys = {}
     else:
-        req_keys = ['name', 'software', 'method']
-        good_keys = [
-            'software',
-            'run_options',
-            'stats',
-            'context',
-            'contexts',
-            'base',
-            'sequences',
-            'repeats',
-            'groups',
-            'nest',
-            'merge_priority',
-            'output_map_options',
-        ] + req_keys
+        req_keys = _REQ_TASK_KEYS
+        good_keys = _ALLOWED_TASK_KEYS
 
         def_keys = {
             'run_options': {},
@@ -804,21 +966,21 @@ def validate_task_dict(task, is_from_file, all_software, all_task_schemas,
             'output_map_options': {},
         }
 
-    miss_keys = list(set(req_keys) - set(task.keys()))
+    miss_keys = req_keys - task.keys()
     if miss_keys:
-        miss_keys_fmt = ', '.join([f'"{i}"' for i in miss_keys])
+        miss_keys_fmt = quote_join(miss_keys)
         msg = (f'Missing keys in Task definition (`is_from_file={is_from_file}`): '
                f'{miss_keys_fmt}.')
         raise TaskError(msg)
 
-    bad_keys = list(set(task.keys()) - set(good_keys))
+    bad_keys = task.keys() - good_keys
     if bad_keys:
-        bad_keys_fmt = ', '.join([f'"{i}"' for i in bad_keys])
+        bad_keys_fmt = quote_join(bad_keys)
         msg = (f'Unknown keys in Task definition (`is_from_file={is_from_file}`): '
                f'{bad_keys_fmt}.')
         raise TaskError(msg)
 
-    task = {**def_keys, **copy.deepcopy(task)}
+    task = {**def_keys, **copy_containers(task)}
 
     all_run_opts = task.pop('run_options')
     prep_run_opts = all_run_opts.pop('preparation', {})
@@ -888,10 +1050,11 @@ def validate_task_dict(task, is_from_file, all_software, all_task_schemas,
             msg = (f'No matching task schema found for task name "{task["name"]}" with '
                    f'method "{task["method"]}" and software "{soft_inst.software}".')
             raise MissingSchemaError(msg)
-        if not Config.get('schema_validity')[schema_key][0]:
+        schema_validity = Config.get('schema_validity')[schema_key]
+        if not schema_validity[0]:
             msg = (f'Task schema invalid for task schema name "{task["name"]}" with '
                    f'method "{task["method"]}" and software "{soft_inst.software}": '
-                   f'{Config.get("schema_validity")[schema_key][1]}')
+                   f'{schema_validity[1]}')
             raise UnsatisfiedSchemaError(msg)
 
         # Check any sources required by the main software instance are defined in the
@@ -905,10 +1068,22 @@ def validate_task_dict(task, is_from_file, all_software, all_task_schemas,
 
     else:
         task_list = []
-        for context in task['contexts']:
-            task_copy = copy.deepcopy(task)
+        contexts = task.pop('contexts')
+        for context_idx, context in enumerate(contexts):
+            if context_idx == len(contexts) - 1:
+                # The containers of `task` are already copies of the original, so reuse
+                # it (its schema and software instances are still copied below):
+                task_copy = task
+            else:
+                task_copy = copy_containers(task)
+            # The schema (whose input and output maps are modified according to the
+            # command pathway) and the software instances are modified per task, so
+            # each task gets its own copies (sharing a memo preserves any sharing
+            # between them):
+            memo = {}
+            for key in _TASK_OBJECT_KEYS:
+                task_copy[key] = copy.deepcopy(task_copy[key], memo)
             task_copy['context'] = context
-            del task_copy['contexts']
             task_list.append(task_copy)
 
     return task_list
@@ -955,59 +1130,94 @@ def order_tasks(task_lst):
     return task_lst_srt, dep_idx_singled
 
 
-def set_default_nesting(task_lst, dep_idx):
-    """Set default `nest` and `merge_priority` for each task."""
+def find_group_idx(combined_arr):
+    """Find the group index of each element, and the element indices of each group, where
+    elements are grouped by equal values in each row of an array of grouping keys.
 
-    for idx, downstream_tsk in enumerate(task_lst):
+    Parameters
+    ----------
+    combined_arr : ndarray of int of shape (R, N)
+        Grouping keys, with one row for each of the `R` grouping parameters, and one
+        column for each of the `N` elements.
 
-        # Do any further downstream tasks depend on this task?
-        depended_on = False
-        for dep_idx_i in dep_idx[(idx + 1):]:
-            if idx in dep_idx_i:
-                depended_on = True
-                break
+    Returns
+    -------
+    group_idx : ndarray of int
+    group_elem_idx : tuple of ndarray of int
 
-        if not depended_on and downstream_tsk.get('nest') is not None:
-            msg = '`nest` value is specified but not required for task "{}".'
-            warn(msg.format(downstream_tsk['name']))
+    """
 
-        # Add `nest: True` by default to this task if nesting is not specified, and if at
-        # least one further downstream task depends on this task:
-        if downstream_tsk.get('nest', None) is None:
-            if depended_on:
-                downstream_tsk['nest'] = True
+    # Find unique columns (equivalent to `np.unique(axis=1)`, but faster) by sorting
+    # columns lexicographically (first row as the primary key), and then finding
+    # where adjacent sorted columns differ:
+    if combined_arr.shape[0] == 1:
+        # Common case of a single grouping parameter; a 1D stable sort suffices:
+        row = combined_arr[0]
+        sort_idx = np.argsort(row, kind='stable')
+        sorted_row = row[sort_idx]
+        is_new_group = sorted_row[1:] != sorted_row[:-1]
+    else:
+        sort_idx = np.lexsort(combined_arr[::-1])
+        sorted_arr = combined_arr[:, sort_idx]
+        is_new_group = np.any(sorted_arr[:, 1:] != sorted_arr[:, :-1], axis=0)
+
+    group_idx = np.empty_like(sort_idx)
+    group_idx[sort_idx] = np.concatenate([[0], np.cumsum(is_new_group)])
+
+    # Since the sort is stable, element indices within each group are increasing:
+    group_elem_idx = tuple(np.split(sort_idx, np.flatnonzero(is_new_group) + 1))
 
+    return group_idx, group_elem_idx
 
-def resolve_group(group, local_inputs, repeats_idx):
+
+def resolve_group(group, local_inputs, repeats_idx, group_idx_cache=None):
+    """Resolve the group index of each element, and the element indices of each group, of
+    a group of task elements.
+
+    Parameters
+    ----------
+    group : dict
+    local_inputs : dict
+    repeats_idx : list of int
+    group_idx_cache : dict, optional
+        If specified, results of `find_group_idx` are stored in and retrieved from this
+        dict, keyed by the grouping keys, so that recurring groupings are only found
+        once. The cache should not outlive the construction of a single workflow.
+
+    """
 
     # TODO (later): allow `group_by` on inputs from upstream tasks?
     # See: https://github.com/LightForm-group/matflow/issues/10
 
-    combined_arr = []
-    new_group_by = []
-    for i in group['group_by']:
-        if (i != 'repeats') and (i not in local_inputs):
-            # Can only group on locally parametrised inputs.
-            continue
-        else:
-            new_group_by.append(i)
-        if i != 'repeats':
-            combined_arr.append(local_inputs[i]['vals_idx'])
-        else:
-            combined_arr.append([(i or -1) for i in repeats_idx])
+    # Can only group on locally parametrised inputs:
+    new_group_by = [i for i in group['group_by']
+                    if (i == 'repeats') or (i in local_inputs)]
+
+    if new_group_by:
+        # Fill a single preallocated array with a row for each grouping parameter:
+        combined_arr = np.empty((len(new_group_by), len(repeats_idx)), dtype=np.int64)
+        for row_idx, i in enumerate(new_group_by):
+            if i != 'repeats':
+                combined_arr[row_idx] = local_inputs[i]['vals_idx']
+            else:
+                combined_arr[row_idx] = [(j or -1) for j in repeats_idx]
 
-    if combined_arr:
-        combined_arr = np.vstack(combined_arr)
-        _, group_idx = np.unique(combined_arr, axis=1, return_inverse=True)
-        group_elem_idx = [list(np.where(group_idx == i)[0])
-                          for i in range(max(group_idx) + 1)]
+        if group_idx_cache is None:
+            group_idx, group_elem_idx = find_group_idx(combined_arr)
+        else:
+            cache_key = (len(new_group_by), combined_arr.tobytes())
+            if cache_key not in group_idx_cache:
+                group_idx_cache[cache_key] = find_group_idx(combined_arr)
+            group_idx, group_elem_idx = group_idx_cache[cache_key]
+        group_elem_idx = [list(i) for i in group_elem_idx]
         group_idx = list(group_idx)
     else:
         length = len(repeats_idx)
         group_idx = [0] * length
         group_elem_idx = [arange(length)]
 
-    group_resolved = copy.deepcopy(group)
+    # All list values of the group are replaced, so a shallow copy is sufficient:
+    group_resolved = {**group}
     group_resolved.update({
         'group_idx_per_iteration': group_idx,
         'group_element_idx_per_iteration': group_elem_idx,
@@ -1033,18 +1243,19 @@ def get_input_groups(task_idx, task_lst, dependency_idx, element_idx):
     """
 
     task = task_lst[task_idx]
-    local_input_names = list(task['local_inputs']['inputs'].keys())
+    local_inputs = task['local_inputs']['inputs']
     non_local_inputs = [i for i in task['schema'].inputs
-                        if i['name'] not in local_input_names]
+                        if i['name'] not in local_inputs]
 
+    alias_to_group = get_schema_info(task['schema'])['alias_to_group']
+    task_param_deps = dependency_idx[task_idx]['parameter_dependencies']
     input_groups = {}
     for non_local_input_i in non_local_inputs:
 
-        input_alias = non_local_input_i['alias']
+        input_alias = sys.intern(non_local_input_i['alias'])
         input_name = non_local_input_i['name']
-        group_name = task['schema'].get_input_by_alias(input_alias)['group']
+        group_name = alias_to_group[input_alias]
 
-        task_param_deps = dependency_idx[task_idx]['parameter_dependencies']
         input_task_idx = task_param_deps[input_alias]['from_task']
         input_task = task_lst[input_task_idx]
 
@@ -1054,10 +1265,10 @@ def get_input_groups(task_idx, task_lst, dependency_idx, element_idx):
             group_name_ = 'user_group_' + group_name
 
         group_dict = element_idx[input_task_idx]['groups']
-        group_names_fmt = ', '.join([f'"{i}"' for i in group_dict.keys()])
         group_dat = group_dict.get(group_name_)
 
         if group_dat is None:
+            group_names_fmt = quote_join(group_dict.keys())
             msg = (f'No group "{group_name}" defined in the workflow for '
                    f'input "{input_name}". Defined groups are: '
                    f'{group_names_fmt}.')
@@ -1075,6 +1286,98 @@ def get_input_groups(task_idx, task_lst, dependency_idx, element_idx):
     return input_groups
 
 
+# Minimum number of extended group indices for which `extend_group_idx` uses arrays:
+_EXTEND_GROUP_ARRAY_SIZE = 200
+
+
+def extend_group_idx(group, repeats):
+    """Extend, in place, the group indices and group element indices of a resolved group
+    to cover a number of repeats of its elements.
+
+    Parameters
+    ----------
+    group : dict
+        Resolved group, as returned by `resolve_group`.
+    repeats : int
+
+    Notes
+    -----
+    This is equivalent to applying `extend_index_list` to the group indices and to the
+    flattened group element indices. For large groups, the group element indices are
+    extended as a flat array with offsets, and only converted back to a list of lists
+    once. Small groups are extended with list operations, for which the overhead of
+    converting to and from arrays would dominate.
+
+    """
+
+    group_elem_idx = group['group_element_idx_per_iteration']
+    num_new_elems = len(group['group_idx_per_iteration']) * repeats
+
+    if repeats > 1 and num_new_elems < _EXTEND_GROUP_ARRAY_SIZE:
+        group_idx = extend_index_list(group['group_idx_per_iteration'], repeats)
+        ge_min = min([min(i) for i in group_elem_idx])
+        ge_max = max([max(i) for i in group_elem_idx])
+        offset = ge_max - ge_min + 1
+        group['group_idx_per_iteration'] = group_idx
+        group['group_element_idx_per_iteration'] = [
+            [j + rep_idx * offset for j in i]
+            for rep_idx in range(repeats)
+            for i in group_elem_idx
+        ]
+
+    elif repeats > 1:
+        group_idx = np.fromiter(
+            group['group_idx_per_iteration'],
+            dtype=int,
+            count=len(group['group_idx_per_iteration']),
+        )
+        ge_flat, ge_offsets = to_flat_index_array(group_elem_idx)
+
+        # Each repeat is offset from the previous by the range of the original indices:
+        rep_idx = np.arange(repeats)[:, None]
+        group_idx = group_idx + rep_idx * (np.ptp(group_idx) + 1)
+        ge_flat = ge_flat + rep_idx * (np.ptp(ge_flat) + 1)
+        ge_offsets = np.concatenate([
+            [0],
+            (ge_offsets[1:] + rep_idx * ge_offsets[-1]).ravel(),
+        ])
+
+        group['group_idx_per_iteration'] = group_idx.ravel().tolist()
+        group['group_element_idx_per_iteration'] = from_flat_index_array(
+            ge_flat.ravel(), ge_offsets)
+
+    else:
+        # Index lists are later extended in place (when adding iterations), so must not
+        # be shared with the group from which this group was copied:
+        group['group_idx_per_iteration'] = list(group['group_idx_per_iteration'])
+        group['group_element_idx_per_iteration'] = [list(i) for i in group_elem_idx]
+
+    new_num_groups = group['num_groups_per_iteration'] * repeats
+    group['num_groups_per_iteration'] = new_num_groups
+    group['num_groups'] = new_num_groups
+
+
+def get_iteration_element_idx(iteration_idx):
+    """Group element indices by iteration, in a single pass.
+
+    Parameters
+    ----------
+    iteration_idx : list of int
+        Iteration index of each element.
+
+    Returns
+    -------
+    list of ndarray
+        For each iteration index up to the maximum, the increasing indices of the elements
+        that belong to that iteration.
+
+    """
+    iteration_idx = np.asarray(iteration_idx, dtype=int)
+    elems_order = np.argsort(iteration_idx, kind='stable')
+    iter_sizes = np.bincount(iteration_idx)
+    return np.split(elems_order, np.cumsum(iter_sizes)[:-1])
+
+
 def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
     """For each task, find the element indices that determine the elements to be used
     (i.e from upstream tasks) to populate task inputs.
@@ -1109,6 +1412,9 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
 
     # todo ensure default nest and merge_priority are set on each group (in local_inputs).
 
+    # Groupings found for this workflow, since tasks often share the same groupings:
+    group_idx_cache = {}
+
     element_idx = []
     for idx, downstream_task in enumerate(task_lst):
 
@@ -1121,13 +1427,16 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
         loc_in = downstream_task['local_inputs']
         schema = downstream_task['schema']
 
+        if loc_in['inputs'] or not upstream_tasks:
+            # Local input groups do not depend on merging, so resolve them up front:
+            groups = {
+                group_name: resolve_group(group, loc_in['inputs'], loc_in['repeats_idx'],
+                                          group_idx_cache)
+                for group_name, group in loc_in['groups'].items()
+            }
+
         if not upstream_tasks:
             # This task does not depend on any other tasks.
-            groups = {}
-            for group_name, group in loc_in['groups'].items():
-                group = resolve_group(group, loc_in['inputs'], loc_in['repeats_idx'])
-                groups.update({group_name: group})
-
             input_idx = arange(loc_in['length'])
             elem_idx_i = {
                 'num_elements': loc_in['length'],
@@ -1150,10 +1459,14 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
         else:
             # This task depends on other tasks.
             input_groups = get_input_groups(idx, task_lst, dep_idx, element_idx)
-            is_nesting_mixed = len(set([i['nest'] for i in input_groups.values()])) > 1
+            nests = [i['nest'] for i in input_groups.values()]
+            is_nesting_mixed = any(i != nests[0] for i in nests[1:])
 
+            all_mp = {}
             for input_alias, group_info in input_groups.items():
 
+                all_mp[input_alias] = group_info['merge_priority'] or 0
+
                 if group_info['merge_priority'] is None and is_nesting_mixed:
                     raise MissingMergePriority(
                         f'`merge_priority` for group ("{group_info["group_name"]}") of '
@@ -1170,8 +1483,8 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
                         f'(Merging into task "{downstream_task["name"]}").'
                     )
 
-            all_mp = {k: (v['merge_priority'] or 0) for k, v in input_groups.items()}
-            merging_order = [i[0] for i in sorted(all_mp.items(), key=lambda j: j[1])]
+            # Sorting is stable, so inputs of equal priority keep their order:
+            merging_order = sorted(all_mp, key=all_mp.__getitem__)
 
             # Cannot propagate groups if this task has elements that are sourced from
             # multiple upstream elements (group idx would be ill-defined). Keys are
@@ -1179,7 +1492,6 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
             non_unit_group_sizes = {}
 
             ins_dict = {}
-            groups = {}  # groups defined on the downstream task
             consumed_groups = []
             for merge_order_idx, input_alias in enumerate(merging_order):
 
@@ -1197,11 +1509,10 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
                 if merge_order_idx == 0:
                     if loc_in['inputs']:
                         existing_size = loc_in['length']
-                        repeats_idx = loc_in['repeats_idx']
                         input_idx = arange(existing_size)
+                        name_to_alias = get_schema_info(schema)['name_to_alias']
                         for i in loc_in['inputs']:
-                            inp_alias = [j['alias'] for j in schema.inputs
-                                         if j['name'] == i][0]
+                            inp_alias = name_to_alias[i]
                             ins_dict.update({
                                 inp_alias: {
                                     'local_input_idx': input_idx,
@@ -1213,7 +1524,6 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
 
                     else:
                         existing_size = incoming_size
-                        repeats_idx = [None] * existing_size
                         element_idx_i = in_group['group_element_idx_per_iteration']
                         ins_dict.update({
                             input_alias: {
@@ -1224,11 +1534,14 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
                             }
                         })
 
-                    for group_name, group in loc_in['groups'].items():
-                        group = resolve_group(group, loc_in['inputs'], repeats_idx)
-                        groups.update({group_name: group})
-
-                    if not loc_in['inputs']:
+                        # Without local inputs, groups defined on the downstream task
+                        # span the incoming elements:
+                        repeats_idx = [None] * existing_size
+                        groups = {
+                            group_name: resolve_group(group, {}, repeats_idx,
+                                                      group_idx_cache)
+                            for group_name, group in loc_in['groups'].items()
+                        }
                         continue
 
                 if in_group['nest']:
@@ -1253,22 +1566,8 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
                     })
 
                     # Generate new groups for each group name:
-                    for g_name, g in groups.items():
-
-                        new_g_idx = extend_index_list(
-                            g['group_idx_per_iteration'], incoming_size)
-                        new_ge_idx = to_sub_list(
-                            extend_index_list(
-                                flatten_list(g['group_element_idx_per_iteration']),
-                                incoming_size),
-                            g['group_size_per_iteration']
-                        )
-                        new_num_groups = g['num_groups_per_iteration'] * incoming_size
-
-                        groups[g_name]['group_idx_per_iteration'] = new_g_idx
-                        groups[g_name]['group_element_idx_per_iteration'] = new_ge_idx
-                        groups[g_name]['num_groups_per_iteration'] = new_num_groups
-                        groups[g_name]['num_groups'] = new_num_groups
+                    for g in groups.values():
+                        extend_group_idx(g, incoming_size)
 
                     existing_size *= incoming_size
 
@@ -1305,7 +1604,17 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
                         k not in consumed_groups
                     ):
                         if not non_unit_group_sizes[up_task['task_idx']]:
-                            prop_groups.update({k: copy.deepcopy(v)})
+                            # Index lists are extended in place when adding
+                            # iterations, so copy them:
+                            prop_groups.update({k: {
+                                **v,
+                                'group_idx_per_iteration': list(
+                                    v['group_idx_per_iteration']),
+                                'group_element_idx_per_iteration': [
+                                    list(i) for i in
+                                    v['group_element_idx_per_iteration']
+                                ],
+                            }})
                         else:
                             msg = (
                                 f'Cannot propagate group "{k}" from task '
@@ -1316,23 +1625,10 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
                             )
                             raise IncompatibleWorkflow(msg)
 
-            for group_name, g in prop_groups.items():
-
+            for g in prop_groups.values():
                 group_reps = existing_size // (g['num_groups_per_iteration']
                                                * g['group_size_per_iteration'])
-                new_g_idx = extend_index_list(g['group_idx_per_iteration'], group_reps)
-                new_ge_idx = to_sub_list(
-                    extend_index_list(
-                        flatten_list(g['group_element_idx_per_iteration']),
-                        group_reps),
-                    g['group_size_per_iteration']
-                )
-                new_num_groups = g['num_groups_per_iteration'] * group_reps
-
-                prop_groups[group_name]['group_idx_per_iteration'] = new_g_idx
-                prop_groups[group_name]['group_element_idx_per_iteration'] = new_ge_idx
-                prop_groups[group_name]['num_groups_per_iteration'] = new_num_groups
-                prop_groups[group_name]['num_groups'] = new_num_groups
+                extend_group_idx(g, group_reps)
 
             all_groups = {**groups, **prop_groups}
 
@@ -1348,15 +1644,17 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
         element_idx.append(elem_idx_i)
 
     # First iteration is in place, add additional iterations (if they exist for this
-    # task):
+    # task). Tasks with a single iteration are skipped:
+    iter_task_idx = [idx for idx, i in enumerate(element_idx) if i['num_iterations'] > 1]
     max_num_iter = max([i['num_iterations'] for i in element_idx])
     for iter_idx in range(1, max_num_iter):
 
         # print(f'Adding elements for iteration {iter_idx}')
 
         # Add iterations:
-        for task_idx, elem_idx_i in enumerate(element_idx):
+        for task_idx in iter_task_idx:
 
+            elem_idx_i = element_idx[task_idx]
             num_iterations_i = elem_idx_i['num_iterations']
 
             if iter_idx >= num_iterations_i:
@@ -1365,10 +1663,11 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
             # print(f'\tConsidering task {task_idx}, with num_iterations_i: '
             #       f'{num_iterations_i}')
 
-            elem_iter_idx = np.array(elem_idx_i['iteration_idx'])
             elems_per_iter = elem_idx_i['num_elements_per_iteration']
-            iter_zero_idx = np.where(elem_iter_idx == 0)[0]
-            # print(f'\titer_zero_idx: {iter_zero_idx}')
+
+            # Element indices of each iteration, for each task dependency (dependency
+            # elements do not change while this task's elements are added):
+            dep_iter_elems = {}
 
             for input_alias, inputs_idx in elem_idx_i['inputs'].items():
 
@@ -1384,14 +1683,13 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
                     # iteration:
 
                     task_dep = iterate['producing_task']
-                    elem_iter_idx_task_dep = np.array(
-                        element_idx[task_dep]['iteration_idx']
-                    )
+                    if task_dep not in dep_iter_elems:
+                        dep_iter_elems[task_dep] = get_iteration_element_idx(
+                            element_idx[task_dep]['iteration_idx']
+                        )
 
                     # elements of task dependency belonging to the previous iteration:
-                    iter_prev_idx_task_dep = np.where(
-                        elem_iter_idx_task_dep == iter_idx - 1
-                    )[0]
+                    iter_prev_idx_task_dep = dep_iter_elems[task_dep][iter_idx - 1]
 
                     # print(f'\t\t\tElements should derive from the '
                     #       f'previous iteration (iter_idx-1={iter_idx-1}) "producing '
@@ -1426,27 +1724,26 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
                     # print(f'\t\t\tElements should derive from the '
                     #       f'most recent iteration.')
                     if inputs_idx['local_input_idx'][0] is not None:
-                        # Tile local inputs for new iteration:
-                        add_elements = {k: [inputs_idx[k][i] for i in iter_zero_idx]
-                                        for k in inputs_idx}
+                        # Tile local inputs for new iteration (elements of the first
+                        # iteration are always the first elements):
+                        add_elements = {k: v[:elems_per_iter]
+                                        for k, v in inputs_idx.items()}
                         # print(f'\t\t\tFound local inputs: additional elements '
                         #       f'are: {add_elements}')
                     else:
                         # Use elements from the most recent iteration of the dependency
                         # task:
                         task_dep = inputs_idx['task_idx'][0]
-                        elem_iter_idx_task_dep = np.array(
-                            element_idx[task_dep]['iteration_idx']
-                        )
+                        if task_dep not in dep_iter_elems:
+                            dep_iter_elems[task_dep] = get_iteration_element_idx(
+                                element_idx[task_dep]['iteration_idx']
+                            )
 
                         # elements of task dependency belonging to the most recent
                         # iteration:
-                        iter_last_idx_task_dep = np.where(
-                            elem_iter_idx_task_dep == np.max(elem_iter_idx_task_dep)
-                        )[0]
+                        iter_last_idx_task_dep = dep_iter_elems[task_dep][-1]
 
-                        iter_zero_elems_idx = [inputs_idx['element_idx'][i]
-                                               for i in iter_zero_idx]
+                        iter_zero_elems_idx = inputs_idx['element_idx'][:elems_per_iter]
                         iter_current_elems_idx = [
                             [iter_last_idx_task_dep[j] for j in i]
                             for i in iter_zero_elems_idx
@@ -1470,10 +1767,8 @@ def get_element_idx(task_lst, dep_idx, num_iterations, iterate):
                     elem_idx_i['inputs'][input_alias][k] += add_elements[k]
 
             # Update num_elements, iteration_idx with each iter_idx loop:
-            new_iter_idx = (
-                element_idx[task_idx]['iteration_idx'] + [iter_idx] * elems_per_iter
-            )
-            element_idx[task_idx]['iteration_idx'] = new_iter_idx
+            new_iter_idx = element_idx[task_idx]['iteration_idx']
+            new_iter_idx.extend([iter_idx] * elems_per_iter)
             element_idx[task_idx]['num_elements'] = len(new_iter_idx)
 
     # print('element_idx')
@@ -1521,23 +1816,24 @@ def init_local_inputs(task_lst, is_from_file, check_integrity):
 
         # Substitute command file names in input and output maps:
         command_file_names = cmd_group.get_command_file_names(cmd_pth_idx)
-        for in_map_idx, in_map in enumerate(schema.input_map):
-            for cmd_fn_label, cmd_fn in command_file_names['input_map'].items():
-                if f'<<{cmd_fn_label}>>' in in_map['file']:
-                    new_fn = in_map['file'].replace(f'<<{cmd_fn_label}>>', cmd_fn)
-                    schema.input_map[in_map_idx]['file_raw'] = in_map['file']
-                    schema.input_map[in_map_idx]['file'] = new_fn
-
-        for out_map_idx, out_map in enumerate(schema.output_map):
-            for out_map_file_idx, out_map_file in enumerate(out_map['files']):
-                for cmd_fn_label, cmd_fn in command_file_names['output_map'].items():
-                    if f'<<{cmd_fn_label}>>' in out_map_file['name']:
-                        new_fn = out_map_file['name'].replace(
-                            f'<<{cmd_fn_label}>>',
-                            cmd_fn,
-                        )
-                        schema.output_map[out_map_idx]['files'][out_map_file_idx]['name_raw'] = out_map_file['name']
-                        schema.output_map[out_map_idx]['files'][out_map_file_idx]['name'] = new_fn
+        for in_map in schema.input_map:
+            new_fn = sub_command_file_names(
+                in_map['file'],
+                command_file_names['input_map'],
+            )
+            if new_fn != in_map['file']:
+                in_map['file_raw'] = in_map['file']
+                in_map['file'] = new_fn
+
+        for out_map in schema.output_map:
+            for out_map_file in out_map['files']:
+                new_fn = sub_command_file_names(
+                    out_map_file['name'],
+                    command_file_names['output_map'],
+                )
+                if new_fn != out_map_file['name']:
+                    out_map_file['name_raw'] = out_map_file['name']
+                    out_map_file['name'] = new_fn
 
     return task_lst
 
@@ -31,7 +31,8 @@ from matflow.errors import (
 )
 from matflow.hicklable import to_hicklable
 from matflow.models.command import DEFAULT_FORMATTERS
-from matflow.models.construction import init_tasks, get_element_idx
+from matflow.models.construction import (init_tasks, get_element_idx,
+                                         get_schema_info as get_task_schema_info)
 from matflow.models.software import SoftwareInstance
 from matflow.models.task import TaskStatus
 from matflow.models.parameters import Parameters
@@ -2015,7 +2016,7 @@ class Workflow(object):
 
         input_task_idx = []
         for task in self.tasks:
-            if parameter_name in task.schema.input_names:
+            if parameter_name in get_task_schema_info(task.schema)['input_names_set']:
                 input_task_idx.append(task.task_idx)
 
         return input_task_idx
@@ -2025,7 +2026,7 @@ class Workflow(object):
 
         output_task_idx = []
         for task in self.tasks:
-            if parameter_name in task.schema.outputs:
+            if parameter_name in get_task_schema_info(task.schema)['outputs_set']:
                 output_task_idx.append(task.task_idx)
 
         return output_task_idx
@@ -2178,8 +2179,10 @@ class Workflow(object):
                      for j in self.get_dependent_tasks(i, recurse=True)]
 
         # Which dep_tasks produces the iteration parameter?
-        outputs_iter_param = [parameter_name in self.tasks[i].schema.outputs
-                              for i in dep_tasks]
+        outputs_iter_param = [
+            parameter_name in get_task_schema_info(self.tasks[i].schema)['outputs_set']
+            for i in dep_tasks
+        ]
 
         if not any(outputs_iter_param):
             msg = (f'Parameter "{parameter_name}" is not output by any task and so '
@@ -189,9 +189,11 @@ def extend_index_list(lst, repeats):
             raise ValueError('List elements must be positive or zero.')
         new_idx.append(i)
 
-    for _ in range(repeats - 1):
-        next_avail_idx = max(new_idx) + 1
-        new_idx.extend([next_avail_idx + i - min(lst) for i in lst])
+    if repeats > 1:
+        # Each repeat is offset from the previous by the range of the original indices:
+        offset = max(lst) - min(lst) + 1
+        for rep_idx in range(1, repeats):
+            new_idx.extend([i + rep_idx * offset for i in lst])
 
     return new_idx
 
@@ -245,6 +247,60 @@ def to_sub_list(lst, sub_list_len):
     return out
 
 
+def to_flat_index_array(lst):
+    """Transform a list of integer lists into a flat array and an array of offsets.
+
+    Parameters
+    ----------
+    lst : list of list of int
+
+    Returns
+    -------
+    flat : ndarray of int
+        All elements of the sub-lists, in order.
+    offsets : ndarray of int
+        Array of length `len(lst) + 1`, such that sub-list `i` is
+        `flat[offsets[i]:offsets[i + 1]]`.
+
+    Examples
+    --------
+    >>> flat, offsets = to_flat_index_array([[0, 2, 4], [9, 1]])
+    >>> flat.tolist(), offsets.tolist()
+    ([0, 2, 4, 9, 1], [0, 3, 5])
+
+    """
+    sizes = np.fromiter((len(i) for i in lst), dtype=int, count=len(lst))
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    flat = np.fromiter(itertools.chain.from_iterable(lst), dtype=int, count=offsets[-1])
+    return flat, offsets
+
+
+def from_flat_index_array(flat, offsets):
+    """Transform a flat array and an array of offsets into a list of integer lists.
+
+    Parameters
+    ----------
+    flat : ndarray of int
+    offsets : ndarray of int
+        See `to_flat_index_array`.
+
+    Returns
+    -------
+    list of list of int
+
+    Examples
+    --------
+    >>> from_flat_index_array(np.array([0, 2, 4, 9, 1]), np.array([0, 3, 5]))
+    [[0, 2, 4], [9, 1]]
+
+    """
+    sizes = np.diff(offsets)
+    if sizes.size and np.all(sizes == sizes[0]) and sizes[0]:
+        # Equally-sized sub-lists can be formed without slicing each:
+        return flat.reshape(-1, sizes[0]).tolist()
+    return [flat[i:j].tolist() for i, j in zip(offsets[:-1], offsets[1:])]
+
+
 def datetime_to_dict(dt):
     return {
         'year': dt.year,
@@ -435,6 +491,20 @@ def nested_dict_arrays_to_list(obj):
     return obj
 
 
+def copy_containers(obj):
+    """Copy nested dicts and lists, without copying any other (leaf) objects.
+
+    This is much cheaper than `copy.deepcopy` for large nested structures, and avoids
+    copying data such as NumPy arrays that are not modified.
+
+    """
+    if isinstance(obj, dict):
+        return {k: copy_containers(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [copy_containers(i) for i in obj]
+    return obj
+
+
 def move_element_forward(lst, index, position, return_map=True):
     """Move a list element forward in the list to a new index position."""
 
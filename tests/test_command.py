@@ -0,0 +1,91 @@
+"""Module containing unit tests on CommandGroup logic."""
+
+import unittest
+
+from matflow.models.command import CommandGroup
+
+
+def init_command_group():
+    """Construct a CommandGroup for CommandFileNamesTestCase tests."""
+    return CommandGroup(
+        commands=[
+            {
+                'command': 'run',
+                'options': [['-i', '<<inp>>'], ['-x<<inp>><<log>>']],
+                'parameters': ['<<log>>'],
+                'stdout': '<<log>>',
+                'stderr': '<<err>>',
+            },
+            {
+                'command': 'post',
+                'parameters': ['<<log>>'],
+                'stdout': '<<log>>',
+            },
+        ],
+        command_files={
+            'inp': 'in_<<inc>>.txt',
+            'log': 'log_<<inc>>.txt',
+            'err': 'err_<<inc>>.txt',
+        },
+    )
+
+
+class CommandFileNamesTestCase(unittest.TestCase):
+    """Tests on command file name resolution in CommandGroup."""
+
+    def test_option_substitution(self):
+        """Test command file labels in option tokens are substituted."""
+        cmd = init_command_group().get_commands(0)[0]
+        self.assertEqual(cmd.options[0], ['-i', 'in_0.txt'])
+
+    def test_multi_marker_substitution(self):
+        """Test all command file labels in a string with multiple labels are
+        substituted."""
+        cmd = init_command_group().get_commands(0)[0]
+        self.assertEqual(cmd.options[1], ['-xin_0.txtlog_0.txt'])
+
+    def test_raw_strings_unmodified(self):
+        """Test raw command strings retain their command file labels."""
+        cmd = init_command_group().get_commands(0)[0]
+        self.assertEqual(cmd.options_raw, [['-i', '<<inp>>'], ['-x<<inp>><<log>>']])
+        self.assertEqual(cmd.parameters_raw, ['<<log>>'])
+
+    def test_parameter_substitution(self):
+        """Test command file labels in parameters use the current file name."""
+        cmds = init_command_group().get_commands(0)
+        self.assertEqual(cmds[0].parameters, ['log_0.txt'])
+        self.assertEqual(cmds[1].parameters, ['log_1.txt'])
+
+    def test_stdout_stderr_increments(self):
+        """Test command file labels in stdout and stderr use a new file name."""
+        cmds = init_command_group().get_commands(0)
+        self.assertEqual(
+            [(i.stdout, i.stderr) for i in cmds],
+            [('log_1.txt', 'err_1.txt'), ('log_2.txt', None)],
+        )
+
+    def test_command_file_names(self):
+        """Test input and output maps use the first and final file names."""
+        file_names = init_command_group().get_command_file_names(0)
+        self.assertEqual(
+            file_names['input_map'],
+            {'inp': 'in_0.txt', 'log': 'log_0.txt', 'err': 'err_0.txt'},
+        )
+        self.assertEqual(
+            file_names['output_map'],
+            {'inp': 'in_0.txt', 'log': 'log_2.txt', 'err': 'err_1.txt'},
+        )
+        self.assertEqual(
+            file_names['all_commands'][0]['options'],
+            {'inp': 'in_0.txt', 'log': 'log_0.txt'},
+        )
+        self.assertEqual(
+            file_names['all_commands'][1],
+            {
+                'stdin': {},
+                'options': {},
+                'parameters': {'log': 'log_1.txt'},
+                'stdout': {'log': 'log_2.txt'},
+                'stderr': {},
+            },
+        )
@@ -1,10 +1,22 @@
 """Module containing unit tests on Workflow initialisation."""
 
 import unittest
+from unittest import mock
 
+from matflow.config import Config
 from matflow.errors import IncompatibleWorkflow
 from matflow.models import TaskSchema
-from matflow.models.construction import get_dependency_idx
+from matflow.models.software import SoftwareInstance
+from matflow.models.construction import (
+    get_dependency_idx,
+    get_local_inputs,
+    singularise_input_dependencies,
+    get_element_idx,
+    has_circular_dependencies,
+    sort_dependency_idx,
+    validate_task_dict,
+    init_local_inputs,
+)
 
 """
 tests for inputs/outputs_idx:
@@ -206,3 +218,203 @@ class TaskDependencyTestCase(unittest.TestCase):
         ]
         with self.assertRaises(IncompatibleWorkflow):
             get_dependency_idx(init_schemas(task_lst))
+
+
+def init_dependency_idx(task_dependencies):
+    """Construct a dependency index for DependencySortTestCase tests, given the task
+    dependencies of each task."""
+    return [
+        {
+            'original_idx': idx,
+            'current_idx': idx,
+            'task_dependencies': task_deps,
+            'parameter_dependencies': {f'p{i}': {'from_task': i} for i in task_deps},
+        }
+        for idx, task_deps in enumerate(task_dependencies)
+    ]
+
+
+class DependencySortTestCase(unittest.TestCase):
+    """Tests on `has_circular_dependencies` and `sort_dependency_idx`"""
+
+    def test_raise_on_indirect_circular_dependency(self):
+        """Test raises on an indirect circular dependency (A -> B -> C -> A)."""
+        dep_idx = init_dependency_idx([[2], [0], [1]])
+        self.assertTrue(has_circular_dependencies(dep_idx))
+        with self.assertRaises(RuntimeError):
+            sort_dependency_idx(dep_idx)
+
+    def test_sort_diamond_dependency(self):
+        """Test an acyclic diamond dependency (D -> B, C -> A), specified in reverse
+        order, is sorted such that each task follows the tasks on which it depends."""
+        dep_idx = init_dependency_idx([[1, 2], [3], [3], []])
+        self.assertFalse(has_circular_dependencies(dep_idx))
+
+        dep_idx_srt = sort_dependency_idx(dep_idx)
+        self.assertEqual(dep_idx_srt[0]['original_idx'], 3)
+        self.assertEqual(dep_idx_srt[-1]['original_idx'], 0)
+        for idx, dep_idx_i in enumerate(dep_idx_srt):
+            self.assertEqual(dep_idx_i['current_idx'], idx)
+            self.assertTrue(all(i < idx for i in dep_idx_i['task_dependencies']))
+            self.assertEqual(
+                sorted(i['from_task'] for i in
+                       dep_idx_i['parameter_dependencies'].values()),
+                sorted(dep_idx_i['task_dependencies']),
+            )
+
+
+def init_config(schema_key):
+    """Construct the configuration items used by `validate_task_dict` for
+    TaskValidationTestCase tests."""
+    config = {'schema_validity': {schema_key: (True, '')}}
+    for i in ['', 'preparation_', 'processing_']:
+        config[f'default_{i}run_options'] = {}
+        config[f'default_sticky_{i}run_options'] = {}
+    return config
+
+
+class TaskValidationTestCase(unittest.TestCase):
+    """Tests on `validate_task_dict` and `init_local_inputs`"""
+
+    def test_command_file_names_independent_between_tasks(self):
+        """Test output map file names are resolved from each task's own command pathway
+        for tasks that share a task schema."""
+
+        schema = TaskSchema(
+            name='one',
+            method='method_1',
+            implementation='soft',
+            inputs=['p1', 'p2'],
+            outputs=['p3'],
+            output_map=[{'files': [{'name': '<<log>>', 'save': False}], 'output': 'p3'}],
+            command_group={
+                'commands': [
+                    {'command': 'cmd_1', 'stdout': '<<log>>'},
+                    {'command': 'cmd_2', 'stdout': '<<log>>'},
+                ],
+                'command_files': {'log': 'log_<<inc>>.txt'},
+                'command_pathways': [
+                    {'commands_idx': [0]},
+                    {'commands_idx': [0, 1], 'condition': ['p2']},
+                ],
+            },
+        )
+        schema_key = ('one', 'method_1', 'soft')
+        config = init_config(schema_key)
+
+        task_lst = []
+        with mock.patch.object(Config, 'get', side_effect=config.__getitem__):
+            for base in [{'p1': 1}, {'p1': 1, 'p2': 2}]:
+                task_lst += validate_task_dict(
+                    {'name': 'one', 'method': 'method_1', 'software': 'soft',
+                     'base': base},
+                    is_from_file=False,
+                    all_software={'soft': [SoftwareInstance('soft')]},
+                    all_task_schemas={schema_key: schema},
+                    all_sources_maps={},
+                )
+            task_lst = init_local_inputs(task_lst, False, check_integrity=False)
+
+        file_names = [i['schema'].output_map[0]['files'][0]['name'] for i in task_lst]
+        self.assertEqual(file_names, ['log_1.txt', 'log_2.txt'])
+        self.assertEqual(schema.output_map[0]['files'][0]['name'], '<<log>>')
+
+    def test_contexts_have_own_schema_and_software(self):
+        """Test each context of a task, including the final context, gets its own copy of
+        the schema and software instances."""
+
+        schema = TaskSchema(
+            name='one',
+            method='method_1',
+            implementation='soft',
+            inputs=['p1'],
+            outputs=['p2'],
+            command_group={'commands': [{'command': 'cmd_1'}]},
+        )
+        software = SoftwareInstance('soft')
+        schema_key = ('one', 'method_1', 'soft')
+        config = init_config(schema_key)
+
+        with mock.patch.object(Config, 'get', side_effect=config.__getitem__):
+            task_lst = validate_task_dict(
+                {'name': 'one', 'method': 'method_1', 'software': 'soft',
+                 'base': {'p1': 1}, 'contexts': ['c1', 'c2']},
+                is_from_file=False,
+                all_software={'soft': [software]},
+                all_task_schemas={schema_key: schema},
+                all_sources_maps={},
+            )
+
+        self.assertEqual([i['context'] for i in task_lst], ['c1', 'c2'])
+        schemas = [schema] + [i['schema'] for i in task_lst]
+        self.assertEqual(len(set(id(i) for i in schemas)), 3)
+        for key in ['software_instance', 'prepare_software_instance',
+                    'process_software_instance']:
+            soft_insts = [software] + [i[key] for i in task_lst]
+            self.assertEqual(len(set(id(i) for i in soft_insts)), 3)
+
+
+def init_element_idx_tasks(task_lst):
+    """Construct task dicts (with local inputs) for ElementIdxGroupTestCase tests."""
+    task_defaults = {
+        'context': '',
+        'base': None,
+        'sequences': None,
+        'repeats': 1,
+        'groups': None,
+        'nest': True,
+        'merge_priority': None,
+    }
+    for idx, i in enumerate(task_lst):
+        task_lst[idx] = {**task_defaults, **i, 'task_idx': idx}
+        task_lst[idx]['schema'] = TaskSchema(
+            command_group={'commands': [{'command': i['name']}]},
+            **i['schema'],
+        )
+        task_lst[idx]['local_inputs'] = get_local_inputs(task_lst[idx], False)
+    return task_lst
+
+
+class ElementIdxGroupTestCase(unittest.TestCase):
+    """Tests on groups in `get_element_idx`"""
+
+    def test_propagated_group_iterations_do_not_modify_upstream_group(self):
+        """Test adding iterations to a task into which a group is propagated does not
+        modify the group of the upstream task in which the group is defined."""
+        task_lst = init_element_idx_tasks([
+            {
+                'name': 'one',
+                'schema': {
+                    'name': 'one',
+                    'inputs': ['p1', 'p2'],
+                    'outputs': ['p3'],
+                },
+                'sequences': [
+                    {'name': 'p1', 'vals': [101, 102], 'nest_idx': 0},
+                    {'name': 'p2', 'vals': [201, 202], 'nest_idx': 1},
+                ],
+                'groups': {'group_A': {'group_by': ['p1'], 'nest': True}},
+            },
+            {
+                'name': 'two',
+                'schema': {
+                    'name': 'two',
+                    'inputs': ['p3'],
+                    'outputs': ['p4'],
+                },
+            },
+            {
+                'name': 'three',
+                'schema': {
+                    'name': 'three',
+                    'inputs': [{'name': 'p4', 'group': 'group_A'}],
+                    'outputs': ['p5'],
+                },
+            },
+        ])
+        dep_idx = singularise_input_dependencies(get_dependency_idx(task_lst))
+        element_idx = get_element_idx(task_lst, dep_idx, 2, None)
+
+        group = element_idx[0]['groups']['user_group_group_A']
+        self.assertEqual(group['group_idx_per_iteration'], [0, 0, 1, 1])
+        self.assertEqual(group['group_element_idx_per_iteration'], [[0, 1], [2, 3]])